@@ -9,11 +9,26 @@ import argparse
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import groupby
 
 
 DISTRO_NAME='LibreELEC'
 
+# Compiled once at module scope so the pattern is reused across instances.
+# nightly image format: {distro}-{proj.device}-{train}-nightly-{date}-githash{-uboot}.img.gz
+# the pattern encodes the distro prefix, nightly token and .img.gz
+# suffix, so one fullmatch per filename classifies it completely
+REGEX_NIGHTLY_IMAGE = re.compile(rf'''
+    {DISTRO_NAME}            # Distro
+    -([0-9a-zA-Z_-]+[.]\w+)  # Device (alphanumerics+'-'.alphanumerics)
+    -(\d+[.]\d+)             # Train (decimals.decimals)
+    -nightly-(\d+)           # Date (decimals)
+    -([0-9a-fA-F]+)          # Git Hash (hexadecimals)
+    (\S*)                    # Uboot name with leading '-' (non-whitespace)
+    \.img\.gz''', re.VERBOSE)
+
 
 class ManageArchive():
     def lchop(self, s, prefix):
@@ -36,15 +51,7 @@ class ManageArchive():
         if not os.path.exists(self._indir):
             raise Exception(f'ERROR: invalid path: {self._indir}')
 
-        # nightly image format: {distro}-{proj.device}-{train}-nightly-{date}-githash{-uboot}(.img.gz || .tar)
-        self._regex_nightly_image = re.compile(r'''
-            ^(\w+)                   # Distro (alphanumerics)
-            -([0-9a-zA-Z_-]+[.]\w+)  # Device (alphanumerics+'-'.alphanumerics)
-            -(\d+[.]\d+)             # Train (decimals.decimals)
-            -nightly-(\d+)           # Date (decimals)
-            -([0-9a-fA-F]+)          # Git Hash (hexadecimals)
-            (\S*)                    # Uboot name with leading '-' (non-whitespace)
-            \.img\.gz''', re.VERBOSE)
+        self._regex_nightly_image = REGEX_NIGHTLY_IMAGE
 
 
     def __enter__(self):
@@ -55,55 +62,51 @@ class ManageArchive():
         pass
 
 
+    # Recursively scan path with os.scandir, yielding DirEntry objects for
+    # regular files. DirEntry caches the stat() result from the directory
+    # scan, so later size lookups don't cost an extra syscall per file.
+    def scantree(self, path):
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                yield from self.scantree(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+    # Walk path, selecting 'LibreELEC-.*.img.gz' nightly files and yielding
+    # one parsed row per file for subsequent processing
+    def parse_files(self, path):
+        for entry in self.scantree(path):
+            f = entry.name
+            # nightly images only; everything else fails the fullmatch
+            parsed_fname = self._regex_nightly_image.fullmatch(f)
+            if parsed_fname is None:
+                if args.verbose:
+                    print(f'Ignored file: {f}')
+                continue
+            dirpath = os.path.dirname(entry.path)
+
+#            fname_parsed = parsed_fname.group(0)
+            fname_device = parsed_fname.group(1)
+#            fname_train = parsed_fname.group(2)
+            fname_date = parsed_fname.group(3)
+#            fname_githash = parsed_fname.group(4)
+            fname_uboot = self.lchop(parsed_fname.group(5), '-') if parsed_fname.group(5) else None
+            # DirEntry.stat() is cached from the directory scan, no extra syscall
+            fname_size = entry.stat().st_size
+
+            yield [f, fname_device, fname_date, fname_uboot, dirpath, fname_size]
+
+
     def PruneArchive(self):
         path = self._indir
         retention = int(args.keep)
 
-        # Walk input directory, selecting files for subsequent processing.
-        # Search for 'LibreELEC-.*.img.gz' files.
-        list_of_files = []
-        builds = []
-        for (dirpath, dirnames, filenames) in os.walk(path):
-            for f in filenames:
-                if f.startswith(f'{DISTRO_NAME}-'):
-                    # nightly images
-                    if f.endswith('.img.gz') and 'nightly' in f:
-                        try:
-                            parsed_fname = self._regex_nightly_image.search(f)
-                        except Exception:
-                            print(f'Failed to parse filename: {f}')
-                            continue
-                    else:
-                        if args.verbose:
-                            print(f'Ignored file: {f}')
-                        continue
-
-#                    fname_parsed = parsed_fname.group(0)
-                    fname_distro = parsed_fname.group(1)
-                    fname_device = parsed_fname.group(2)
-#                    fname_train = parsed_fname.group(3)
-                    fname_date = parsed_fname.group(4)
-#                    fname_githash = parsed_fname.group(5)
-                    fname_uboot = self.lchop(parsed_fname.group(6), '-') if parsed_fname.group(6) else None
-#                    fname_timestamp = datetime.fromtimestamp(os.path.getmtime(os.path.join(dirpath,f))).isoformat(sep=' ', timespec='seconds')
-
-                    if fname_device not in builds:
-#                        if args.verbose:
-#                            print(f'Adding to builds: {fname_device}')
-                        builds.append(fname_device)
-
-#                    list_of_files.append([f, fname_device, fname_date, fname_githash, fname_uboot, dirpath, fname_timestamp])
-                    list_of_files.append([f, fname_device, fname_date, fname_uboot, dirpath])
-                else:
-                    if args.verbose:
-                        print(f'Ignored file: {f}')
-                    continue
-
-        # Sort file list by date in filename
-        list_of_files.sort(key=lambda data: data[2])
-
-        # Sort list of builds (eg. RPi2.arm, Generic.x86_64 etc.)
-        builds = sorted(builds)
+        # Build the file list, sorted by date in filename, straight from the
+        # walk generator, then derive the sorted list of builds (eg. RPi2.arm,
+        # Generic.x86_64 etc.) from the collected rows
+        list_of_files = sorted(self.parse_files(path), key=lambda data: data[2])
+        builds = sorted({release_file[1] for release_file in list_of_files})
         if args.verbose:
             print(builds)
 
@@ -115,31 +118,44 @@ class ManageArchive():
         purge_filesize = 0
         purge_date = datetime.now() - timedelta(days=retention)
 
-        for build in builds: # ex: RPi2.arm
-            release_weeks = []
-            for release_file in list_of_files:
-                # process one build at a time
-                if build in release_file:
-                    file_date = release_file[2]
-                    file_device = release_file[3] if release_file[3] else build
-                    # convert YYYYMMDD date string to iso format, then to a datetime object
-                    file_datetime = datetime.fromisoformat(f'{file_date[0:4]}-{file_date[4:6]}-{file_date[6:8]}')
-                    if file_datetime < purge_date:
-                        file_fullpath = f'{release_file[4]}/{release_file[0]}'
-                        file_size = os.path.getsize(file_fullpath)
-                        # get year and week from datetime object
-                        file_year = file_datetime.isocalendar()[0]
-                        file_week = file_datetime.isocalendar()[1]
-                        file_details = [file_fullpath, file_date, file_size, f'{file_year}-{file_week}']
-                        # if year-week not there, add year-week to list
-                        if f'{file_device};{file_year}-{file_week}' not in release_weeks:
-                            release_weeks.append(f'{file_device};{file_year}-{file_week}')
-                            kept_filesize += file_size
-                            kept_filepaths.append(file_details)
-                        # else add path/filename to list of files to delete
-                        else:
-                            purge_filesize += file_size
-                            purge_filepaths.append(file_details)
+        # Dates repeat heavily across devices, so convert each YYYYMMDD date
+        # string to a datetime object, take its isocalendar() and compare it
+        # against the retention cutoff only once, instead of once per file
+        date_cache = {}
+        for release_file in list_of_files:
+            file_date = release_file[2]
+            if file_date not in date_cache:
+                # the direct constructor is faster than building an iso string
+                # for fromisoformat to parse apart again
+                file_datetime = datetime(int(file_date[0:4]), int(file_date[4:6]), int(file_date[6:8]))
+                # get year and week from datetime object
+                (iso_year, iso_week, _) = file_datetime.isocalendar()
+                date_cache[file_date] = (file_datetime < purge_date, iso_year, iso_week)
+
+        # Decorate each file older than the retention window with its
+        # (build, device, iso year, iso week) bucket, then sort and group:
+        # the earliest file of each bucket is kept, the rest are purged.
+        # Images with a uboot variant bucket per variant, like before.
+        decorated = []
+        for release_file in list_of_files:
+            file_date = release_file[2]
+            file_device = release_file[3] if release_file[3] else release_file[1]
+            (file_outside_retention, file_year, file_week) = date_cache[file_date]
+            if file_outside_retention:
+                file_fullpath = os.path.join(release_file[4], release_file[0])
+                file_details = [file_fullpath, file_date, release_file[5], f'{file_year}-{file_week}', release_file[0]]
+                decorated.append(((release_file[1], file_device, file_year, file_week), file_date, file_details))
+        decorated.sort(key=lambda data: (data[0], data[1]))
+
+        for (bucket, group) in groupby(decorated, key=lambda data: data[0]):
+            for (idx, (bucket, file_date, file_details)) in enumerate(group):
+                # first of the group is the one kept for that week
+                if idx == 0:
+                    kept_filesize += file_details[2]
+                    kept_filepaths.append(file_details)
+                else:
+                    purge_filesize += file_details[2]
+                    purge_filepaths.append(file_details)
         # sort files for processing based on their date
         kept_filepaths.sort(key=lambda data: data[1])
         purge_filepaths.sort(key=lambda data: data[1])
@@ -150,7 +166,7 @@ class ManageArchive():
             if args.verbose or args.retained:
                 print('Below files selected for keeping:')
                 for f in kept_filepaths:
-                    file_name = f[0].split(os.path.sep)[-1]
+                    file_name = f[4]
                     file_size = f[2]
                     file_week = f[3]
                     if args.verbose:
@@ -169,15 +185,18 @@ class ManageArchive():
                     print('  --delete not invoked. Keeping all files.')
             for f in purge_filepaths:
                 if args.verbose:
-                    file_name = f[0].split(os.path.sep)[-1]
+                    file_name = f[4]
                     file_size = f[2]
                     file_week = f[3]
                     print(f'{file_name}\t{file_size}\t{file_week}')
                 else:
                     print(f[0])
-                # delete if requested
-                if args.delete and os.path.isfile(f[0]):
-                    os.remove(f[0])
+            # delete if requested; keep several unlinks in flight so the
+            # per-call round-trip on networked filesystems is overlapped
+            if args.delete:
+                paths_to_delete = [f[0] for f in purge_filepaths if os.path.isfile(f[0])]
+                with ThreadPoolExecutor(max_workers=int(args.workers)) as executor:
+                    list(executor.map(os.remove, paths_to_delete))
             if args.verbose:
                 print(f'Total size of purged files: {purge_filesize/(1024**2)}MiB')
         else:
@@ -196,6 +215,9 @@ parser.add_argument('-k', '--keep', metavar='RETENTION', required=True, help='Nu
 
 parser.add_argument('-r', '--retained', action="store_true", help='List filepaths of images being retained and exit.')
 
+parser.add_argument('-w', '--workers', metavar='WORKERS', default=os.cpu_count(), \
+                    help='Number of parallel deletions when --delete is used. Defaults to the CPU count.')
+
 parser.add_argument('-v', '--verbose', action="store_true", help='Enable verbose output (ignored files etc.)')
 
 args = parser.parse_args()
@@ -8,10 +8,20 @@
 import argparse
 import hashlib
 import json
+import mmap
 import os
+import pickle
 import re
-from collections import OrderedDict
-from datetime import datetime
+import ssl
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# orjson serializes several times faster than stdlib json, but is optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 # x.80.z        => (x+1).0.z  (pre-alpha, use next major train)
@@ -49,11 +59,85 @@ VERSIONS = [
 
 BUILDS_PER_DEVICE=10
 JSON_FILE = 'releases.json'
+HASHCACHE_FILE = 'releases.hashcache'
 DISTRO_NAME = 'LibreELEC'
 CANARY_PERIOD = 21 # Days
 PRETTYNAME = f'^{DISTRO_NAME}-.*-([0-9]+\.[0-9]+\.[0-9]+)'
 #PRETTYNAME_NIGHTLY = f'^{DISTRO_NAME}-.*-([0-9]+\.[0-9]+\-.*-[0-9]{8}-[0-9a-z]{7})'
 
+# Compiled once at module scope so the pattern is reused across ReleaseFile
+# instances. One alternation covers both image formats, sharing the common
+# distro/device/train prefix so each filename is scanned once:
+# nightly image format: {distro}-{proj.device}-{train}-nightly-{date}-githash{-uboot}(.img.gz || .tar)
+# release image format: {distro}-{proj.device}-{maj.min}.bug{-uboot}(.img.gz || .tar)
+REGEX_IMAGE = re.compile(r'''
+    (?P<distro>\w+)                    # Distro (alphanumerics)
+    -(?P<device>[0-9a-zA-Z_-]+[.]\w+)  # Device (alphanumerics+'-'.alphanumerics)
+    -(?P<train>\d+[.]\d+)             # Train (decimals.decimals)
+    (?:-nightly-\d+                    # Date (decimals; nightly images only)
+       -(?P<githash>[0-9a-fA-F]+)      # Git Hash (hexadecimals; nightly images only)
+      |\.\d+(\.\d+)?                  # Bug version(s) (release images only)
+    )
+    (?P<uboot>\S*)                     # Uboot name with leading '-' (non-whitespace)
+    (?P<ext>\.img\.gz|\.tar)''', re.VERBOSE)
+
+# One anchored scan deciding whether a distro-prefixed name is a candidate
+# image: '.img.gz' or '.tar', excluding '-noobs.tar' via the lookbehind
+REGEX_IMAGE_SUFFIX = re.compile(r'(?<!-noobs)\.tar$|\.img\.gz$')
+
+# Display names for devices, keyed by {project}.{arch} build name
+DISPLAY_NAME = {'A64.aarch64': 'Allwinner A64',
+                'A64.arm': 'Allwinner A64',
+                'AMLGX.aarch64': 'Amlogic GXBB/GXL/GXM',
+                'AMLGX.arm': 'Amlogic GXBB/GXL/GXM',
+                'Dragonboard.arm': 'Qualcomm Dragonboard',
+                'FORMAT.any': 'Tools',
+                'Generic.x86_64': 'Generic (AMD/Intel)',
+                'Generic-legacy.x86_64': 'Generic Legacy (AMD/Intel/NVIDIA)',
+                'H3.arm': 'Allwinner H3',
+                'H5.aarch64': 'Allwinner H5',
+                'H5.arm': 'Allwinner H5',
+                'H6.aarch64': 'Allwinner H6',
+                'H6.arm': 'Allwinner H6',
+                'imx6.arm': 'NXP i.MX6',
+                'iMX6.arm': 'NXP i.MX6',
+                'iMX8.arm': 'NXP i.MX8',
+                'KVIM.arm': 'Amlogic 3.14',
+                'KVIM2.arm': 'Amlogic 3.14',
+                'Khadas_VIM.arm': 'Amlogic 3.14',
+                'Khadas_VIM2.arm': 'Amlogic 3.14',
+                'LePotato.arm': 'Amlogic 3.14',
+                'MiQi.arm': 'Rockchip RK3288',
+                'Odroid_C2.aarch64': 'Amlogic 3.14',
+                'Odroid_C2.arm': 'Amlogic 3.14',
+                'R40.arm': 'Allwinner R40',
+                'RK3288.arm': 'Rockchip RK3288',
+                'RK3328.aarch64': 'Rockchip RK3328',
+                'RK3328.arm': 'Rockchip RK3328',
+                'RK3399.aarch64': 'Rockchip RK3399',
+                'RK3399.arm': 'Rockchip RK3399',
+                'RPi.arm': 'Raspberry Pi Zero and 1',
+                'RPi2.arm': 'Raspberry Pi 2 and 3',
+                'RPi3.arm': 'Raspberry Pi 3',
+                'RPi4.aarch64': 'Raspberry Pi 4 and 400',
+                'RPi4.arm': 'Raspberry Pi 4 and 400',
+                'RPi5.aarch64': 'Raspberry Pi 5',
+                'RPi5.arm': 'Raspberry Pi 5',
+                'S905.arm': 'Amlogic 3.14',
+                'S912.arm': 'Amlogic 3.14',
+                'Slice.arm': 'Slice CM1/CM3',
+                'Slice3.arm': 'Slice CM1/CM3',
+                'TinkerBoard.arm': 'Rockchip RK3288',
+                'Virtual.x86_64': 'Virtual x86_64',
+                'WeTek_Core.arm': 'Amlogic 3.10',
+                'WeTek_Hub.aarch64': 'Amlogic 3.14',
+                'WeTek_Hub.arm': 'Amlogic 3.14',
+                'WeTek_Play.arm': 'Amlogic 3.10',
+                'WeTek_Play_2.aarch64': 'Amlogic 3.14',
+                'WeTek_Play_2.arm': 'Amlogic 3.14',
+               }
+
+
 class ChunkedHash():
     # Calculate hash for chunked data
     @staticmethod
@@ -62,23 +146,42 @@ class ChunkedHash():
             hasher.update(block)
         return (hasher.hexdigest() if ashexstr else hasher.digest())
 
-    # Read file in blocks/chunks to be memory efficient
+    # Read file in blocks/chunks to be memory efficient. 1 MiB blocks amortize
+    # the per-chunk python overhead and line up with kernel readahead; going
+    # larger shows no further gain and only grows the working set.
     @staticmethod
-    def file_as_blockiter(afile, blocksize=65536):
+    def file_as_blockiter(afile, blocksize=1<<20):
         with afile:
           block = afile.read(blocksize)
           while len(block) > 0:
               yield block
               block = afile.read(blocksize)
 
-    # Calculate sha256 hash for a file
+    # Calculate sha256 hash for a file. Errors (unreadable file etc.)
+    # propagate to the caller; swallowing them would only hide real bugs.
     @staticmethod
     def calculate_sha256(fname):
-        try:
-            return ChunkedHash.hash_bytestr_iter(ChunkedHash.file_as_blockiter(open(fname, 'rb')), hashlib.sha256())
-        except Exception:
-            raise
-            return ''
+        afile = open(fname, 'rb')
+        # hint sequential access so the kernel widens its read-ahead
+        # window and keeps the hash fed; matters on HDD/NFS archives
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(afile.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        # hashlib.file_digest (python 3.11+) keeps the read loop in C with
+        # a reusable readinto buffer; fall back to chunked reads on 3.8
+        if hasattr(hashlib, 'file_digest'):
+            with afile:
+                return hashlib.file_digest(afile, 'sha256').hexdigest()
+        # without file_digest, mmap large files and hash the mapping in a
+        # single call so OpenSSL sees one contiguous buffer; fall through
+        # to chunked reads for small files or filesystems without mmap
+        if os.fstat(afile.fileno()).st_size >= (16 << 20):
+            try:
+                with mmap.mmap(afile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with afile:
+                        return hashlib.sha256(mm).hexdigest()
+            except (ValueError, OSError):
+                pass
+        return ChunkedHash.hash_bytestr_iter(ChunkedHash.file_as_blockiter(afile), hashlib.sha256())
 
 class ReleaseFile():
     def lchop(self, s, prefix):
@@ -93,6 +196,15 @@ class ReleaseFile():
             return s[:-len(suffix)]
         return s
 
+    # Remove and return the first remaining row with this filename from a
+    # workset keyed by (filename, subpath); insertion order is timestamp
+    # order, so this matches the old first-match list scan
+    def pop_named(self, group_files, name):
+        for key in group_files:
+            if key[0] == name:
+                return group_files.pop(key)
+        return None
+
     def __init__(self, args):
         self._json_file = JSON_FILE
         self._indir = self.rchop(args.input, os.path.sep)
@@ -100,6 +212,7 @@ class ReleaseFile():
         self._outdir = self.rchop(args.output, os.path.sep) if args.output else self._indir
         self._infile  = os.path.join(self._indir, self._json_file)
         self._outfile = os.path.join(self._outdir, self._json_file)
+        self._hashcache_file = os.path.join(self._outdir, HASHCACHE_FILE)
         self._prettyname = args.prettyname if args.prettyname else PRETTYNAME
 
         if not os.path.exists(self._indir):
@@ -107,75 +220,9 @@ class ReleaseFile():
         if not os.path.exists(self._outdir):
             raise Exception(f'ERROR: invalid path: {self._outdir}')
 
-        # nightly image format: {distro}-{proj.device}-{train}-nightly-{date}-githash{-uboot}(.img.gz || .tar)
-        self._regex_nightly_image = re.compile(r'''
-            ^(\w+)                   # Distro (alphanumerics)
-            -([0-9a-zA-Z_-]+[.]\w+)  # Device (alphanumerics+'-'.alphanumerics)
-            -(\d+[.]\d+)             # Train (decimals.decimals)
-            -nightly-\d+             # Date (decimals)
-            -([0-9a-fA-F]+)          # Git Hash (hexadecimals)
-            (\S*)                    # Uboot name with leading '-' (non-whitespace)
-            (\.img\.gz|\.tar)''', re.VERBOSE)
-        # release image format: {distro}-{proj.device}-{maj.min}.bug{-uboot}(.img.gz || .tar)
-        self._regex_release_image = re.compile(r'''
-            ^(\w+)                   # Distro (alphanumerics)
-            -([0-9a-zA-Z_-]+[.]\w+)  # Device (alphanumerics.alphanumerics)
-            -(\d+\.\d+)\.\d+(\.\d+)? # Train (decimals.decimals).decimals(.decimals(optional))
-            (\S*)                    # Uboot name with leading '-' (non-whitespace)
-            (\.img\.gz|\.tar)''', re.VERBOSE)
-
-        self.display_name = {'A64.aarch64': 'Allwinner A64',
-                             'A64.arm': 'Allwinner A64',
-                             'AMLGX.aarch64': 'Amlogic GXBB/GXL/GXM',
-                             'AMLGX.arm': 'Amlogic GXBB/GXL/GXM',
-                             'Dragonboard.arm': 'Qualcomm Dragonboard',
-                             'FORMAT.any': 'Tools',
-                             'Generic.x86_64': 'Generic (AMD/Intel)',
-                             'Generic-legacy.x86_64': 'Generic Legacy (AMD/Intel/NVIDIA)',
-                             'H3.arm': 'Allwinner H3',
-                             'H5.aarch64': 'Allwinner H5',
-                             'H5.arm': 'Allwinner H5',
-                             'H6.aarch64': 'Allwinner H6',
-                             'H6.arm': 'Allwinner H6',
-                             'imx6.arm': 'NXP i.MX6',
-                             'iMX6.arm': 'NXP i.MX6',
-                             'iMX8.arm': 'NXP i.MX8',
-                             'KVIM.arm': 'Amlogic 3.14',
-                             'KVIM2.arm': 'Amlogic 3.14',
-                             'Khadas_VIM.arm': 'Amlogic 3.14',
-                             'Khadas_VIM2.arm': 'Amlogic 3.14',
-                             'LePotato.arm': 'Amlogic 3.14',
-                             'MiQi.arm': 'Rockchip RK3288',
-                             'Odroid_C2.aarch64': 'Amlogic 3.14',
-                             'Odroid_C2.arm': 'Amlogic 3.14',
-                             'R40.arm': 'Allwinner R40',
-                             'RK3288.arm': 'Rockchip RK3288',
-                             'RK3328.aarch64': 'Rockchip RK3328',
-                             'RK3328.arm': 'Rockchip RK3328',
-                             'RK3399.aarch64': 'Rockchip RK3399',
-                             'RK3399.arm': 'Rockchip RK3399',
-                             'RPi.arm': 'Raspberry Pi Zero and 1',
-                             'RPi2.arm': 'Raspberry Pi 2 and 3',
-                             'RPi3.arm': 'Raspberry Pi 3',
-                             'RPi4.aarch64': 'Raspberry Pi 4 and 400',
-                             'RPi4.arm': 'Raspberry Pi 4 and 400',
-                             'RPi5.aarch64': 'Raspberry Pi 5',
-                             'RPi5.arm': 'Raspberry Pi 5',
-                             'S905.arm': 'Amlogic 3.14',
-                             'S912.arm': 'Amlogic 3.14',
-                             'Slice.arm': 'Slice CM1/CM3',
-                             'Slice3.arm': 'Slice CM1/CM3',
-                             'TinkerBoard.arm': 'Rockchip RK3288',
-                             'Virtual.x86_64': 'Virtual x86_64',
-                             'WeTek_Core.arm': 'Amlogic 3.10',
-                             'WeTek_Hub.aarch64': 'Amlogic 3.14',
-                             'WeTek_Hub.arm': 'Amlogic 3.14',
-                             'WeTek_Play.arm': 'Amlogic 3.10',
-                             'WeTek_Play_2.aarch64': 'Amlogic 3.14',
-                             'WeTek_Play_2.arm': 'Amlogic 3.14',
-                            }
-
         self.update_json = {}
+        self._digests = {}
+        self._sidecars = set()
 
     def __enter__(self):
         return self
@@ -183,33 +230,88 @@ class ReleaseFile():
     def __exit__(self, type, value, traceback):
         pass
 
+    # Recursively scan path with os.scandir, yielding DirEntry objects for
+    # regular files. DirEntry caches the stat() result from the directory
+    # scan, so later size/mtime lookups don't cost an extra syscall per file.
+    def scantree(self, path):
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                if 'archive' in entry.path or 'upload' in entry.path:
+                    if args.verbose:
+                        print(f'Skipping directory: {entry.path}')
+                    continue
+                yield from self.scantree(entry.path)
+            elif entry.is_file():
+                yield entry
+
     # provide version number; returns version number adjusted to stable release train
-    def get_train_major_minor(self, item):
-        for version in VERSIONS:
-            match = VERSIONS[version]['regex'].search(item)
-            if match:
-                adjust = VERSIONS[version]['adjust']
-                item_maj_min = float(match.group(0)) + adjust
-                return f'{item_maj_min:.1f}'
+    # memoized: only a handful of distinct train strings recur across the
+    # whole archive, so each one is classified by the regex exactly once
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_train_major_minor(item):
+        match = VERSION_REGEX.search(item)
+        if match:
+            (major, minor) = match.group(0).split('.')
+            (dmajor, dminor) = VERSION_BUMP[match.group(1)]
+            if dmajor:
+                return f'{int(major) + dmajor}.0'
+            return f'{major}.{int(minor) + dminor}'
         return None
 
-    def get_details(self, path, train, build, file):
-        key = f'{train};{build};{file}'
-        if key not in self.oldhash:
+    # An old json entry is only trusted while the file's size and timestamp
+    # still match; a file replaced under the same name gets re-hashed instead
+    # of keeping the stale digest
+    def oldhash_entry_current(self, key, size, timestamp):
+        data = self.oldhash.get(key)
+        # accept str sizes from json written before sizes became ints
+        return data is not None and int(data['size']) == size and data['timestamp'] == timestamp
+
+    def get_details(self, path, train, build, file, size, timestamp):
+        key = (train, build, file)
+        if not self.oldhash_entry_current(key, size, timestamp):
             print(f'Adding: {file} to {train} train')
+            # join the path once; size and mtime are already known from the
+            # DirEntry stat cached during the walk, so no stat happens here
+            fullpath = os.path.join(path, file)
+            sidecar = f'{fullpath}.sha256'
+            cache_key = (fullpath, size, timestamp)
             # Use .sha256 file's checksum if present
-            if os.path.exists(os.path.join(path, f'{file}.sha256')):
+            digest_tokens = None
+            if sidecar in self._sidecars:
+                # sidecars are '<hex> <name>\n'; a bounded binary read covers
+                # the digest without slurping and decoding the whole file
+                with open(sidecar, 'rb') as f:
+                    digest_tokens = f.read(128).split()
+                if not digest_tokens:
+                    # eg. an interrupted sidecar write; fall through and hash
+                    print(f'WARNING: Empty sha256 sidecar, ignoring: {file}.sha256')
+            if digest_tokens:
                 if args.verbose:
                     print(f'  Using sha256sum from: {file}.sha256')
-                with open(os.path.join(path, f'{file}.sha256'), 'r') as f:
-                    digest_contents = f.read()
-                file_digest = digest_contents.split(' ')[0]
+                file_digest = digest_tokens[0].decode('ascii')
+            elif cache_key in self.hashcache:
+                if args.verbose:
+                    print(f'  Using sha256sum from hash cache for: {file}')
+                file_digest = self.hashcache[cache_key]
+            # a renamed/moved file keeps its size and timestamp; reuse the
+            # digest recorded for that signature in the old json
+            elif (size, timestamp) in self.oldhash_by_sig:
+                if args.verbose:
+                    print(f'  Using sha256sum from old json entry with same size/timestamp for: {file}')
+                file_digest = self.oldhash_by_sig[(size, timestamp)]
             else:
-                file_digest = ChunkedHash().calculate_sha256(os.path.join(path, file))
-            file_size = str(os.path.getsize(os.path.join(path, file)))
+                # hashed up-front by the worker pool in UpdateFile when possible
+                file_digest = self._digests.get(fullpath)
+                if file_digest is None:
+                    file_digest = ChunkedHash.calculate_sha256(fullpath)
+                    # remember the digest so the same path is never hashed twice
+                    self._digests[fullpath] = file_digest
+                self.hashcache[cache_key] = file_digest
+            file_size = size
         else:
             file_digest = self.oldhash[key]['sha256']
-            file_size = self.oldhash[key]['size']
+            file_size = int(self.oldhash[key]['size'])
         return (file_digest, file_size)
 
     def UpdateAll(self):
@@ -224,94 +326,104 @@ class ReleaseFile():
         # Walk top level source directory, selecting files for subsequent processing.
         # Search for 'LibreELEC-.*.(tar|img.gz)' files, but not '.*-noobs.tar' files.
         list_of_files = []
-        list_of_filenames = []
-        releases = []
-        builds = []
-        for (dirpath, dirnames, filenames) in os.walk(path):
-            if 'archive' in dirpath or 'upload' in dirpath:
-                if args.verbose:
-                    print(f'Skipping directory: {dirpath}')
-                continue
-            for f in filenames:
-                # hardcode the image used to wipe sd cards by the usb-sd tool
-                if f.startswith('LibreELEC-FORMAT.any-1.0.0-erase-usb-sd'):
-                    fname_device = 'FORMAT.any'
-                    fname_githash = None
-                    fname_uboot = ''
-                    fname_timestamp = '1970-01-01 00:00:00'
-                    distro_train = 'LibreELEC-1.0'
-
-                    if distro_train not in releases:
-                        if args.verbose:
-                            print(f'Adding to releases: {distro_train}')
-                        releases.append(distro_train)
-                    if fname_device not in builds:
-                        if args.verbose:
-                            print(f'Adding to builds: {fname_device}')
-                        builds.append(fname_device)
-
-                    list_of_files.append([f, distro_train, fname_device, fname_githash, fname_uboot, dirpath, fname_timestamp])
-                    list_of_filenames.append(f)
-
-                elif f.startswith(f'{DISTRO_NAME}-'):
-                    if (f.endswith('.tar') or f.endswith('.img.gz')) and not f.endswith('-noobs.tar'):
-                        # nightly images
-                        if 'nightly' in f:
-                            try:
-                                parsed_fname = self._regex_nightly_image.search(f)
-                            except Exception:
-                                print(f'Failed to parse filename: {f}')
-                                continue
-                        # release images
-                        else:
-                            try:
-                                parsed_fname = self._regex_release_image.search(f)
-                            except Exception:
-                                print(f'Failed to parse filename: {f}')
-                                continue
-                    else:
-                        if args.verbose:
-                            print(f'Ignored file: {f}')
+        releases = set()
+        builds = set()
+        # each directory's subpath below _indir is constant; strip it once
+        # per directory instead of once per use of every file
+        subpath_cache = {}
+        for entry in self.scantree(path):
+            f = entry.name
+            # remember .sha256 sidecars seen during the walk so later probes
+            # are set lookups instead of an exists() syscall per file
+            if f.endswith('.sha256'):
+                self._sidecars.add(entry.path)
+            dirpath = os.path.dirname(entry.path)
+            file_subpath = subpath_cache.get(dirpath)
+            if file_subpath is None:
+                # don't combine lchops; generates incorrect file_subpath for files not in subdir
+                file_subpath = self.lchop(dirpath, self._indir)
+                file_subpath = self.lchop(file_subpath, '/')
+                subpath_cache[dirpath] = file_subpath
+            # hardcode the image used to wipe sd cards by the usb-sd tool
+            if f.startswith('LibreELEC-FORMAT.any-1.0.0-erase-usb-sd'):
+                fname_device = 'FORMAT.any'
+                fname_githash = None
+                fname_uboot = ''
+                fname_timestamp = '1970-01-01 00:00:00'
+                fname_size = entry.stat().st_size
+                distro_train = 'LibreELEC-1.0'
+
+                if distro_train not in releases:
+                    if args.verbose:
+                        print(f'Adding to releases: {distro_train}')
+                    releases.add(distro_train)
+                if fname_device not in builds:
+                    if args.verbose:
+                        print(f'Adding to builds: {fname_device}')
+                    builds.add(fname_device)
+
+                list_of_files.append([f, distro_train, fname_device, fname_githash, fname_uboot, dirpath, fname_timestamp, fname_size, file_subpath])
+
+            elif f.startswith(f'{DISTRO_NAME}-'):
+                if REGEX_IMAGE_SUFFIX.search(f):
+                    # fullmatch makes a single anchored forward pass; a failed
+                    # match is rejected as soon as the prefix diverges
+                    parsed_fname = REGEX_IMAGE.fullmatch(f)
+                    # a failed match returns None, it does not raise
+                    if parsed_fname is None:
+                        print(f'Failed to parse filename: {f}')
                         continue
-
-#                    fname_parsed = parsed_fname.group(0)
-                    fname_distro = parsed_fname.group(1)
-                    fname_device = parsed_fname.group(2)
-                    fname_train = parsed_fname.group(3)
-                    if 'nightly' in f:
-                        fname_githash = parsed_fname.group(4)
-                    else:
-                        #parsed_fname.group(4) would be the 4th version number
-                        fname_githash = None
-                    fname_uboot = self.lchop(parsed_fname.group(5), '-')
-                    fname_timestamp = datetime.fromtimestamp(os.path.getmtime(os.path.join(dirpath,f))).isoformat(sep=' ', timespec='seconds')
-
-                    distro_train = f'{fname_distro}-{self.get_train_major_minor(fname_train)}'
-                    if distro_train not in releases:
-                        if args.verbose:
-                            print(f'Adding to releases: {distro_train}')
-                        releases.append(distro_train)
-
-                    if fname_device not in builds:
-                        if args.verbose:
-                            print(f'Adding to builds: {fname_device}')
-                        builds.append(fname_device)
-
-                    list_of_files.append([f, distro_train, fname_device, fname_githash, fname_uboot, dirpath, fname_timestamp])
-                    list_of_filenames.append(f)
                 else:
                     if args.verbose:
                         print(f'Ignored file: {f}')
                     continue
 
+#                fname_parsed = parsed_fname.group(0)
+                fname_distro = parsed_fname.group('distro')
+                fname_device = parsed_fname.group('device')
+                fname_train = parsed_fname.group('train')
+                # None for release images
+                fname_githash = parsed_fname.group('githash')
+                fname_uboot = self.lchop(parsed_fname.group('uboot'), '-')
+                # DirEntry.stat() is cached from the directory scan, no extra syscall
+                # time.strftime formats the mtime without allocating a datetime object per file
+                fname_timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.stat().st_mtime))
+                fname_size = entry.stat().st_size
+
+                distro_train = f'{fname_distro}-{self.get_train_major_minor(fname_train)}'
+                if distro_train not in releases:
+                    if args.verbose:
+                        print(f'Adding to releases: {distro_train}')
+                    releases.add(distro_train)
+
+                if fname_device not in builds:
+                    if args.verbose:
+                        print(f'Adding to builds: {fname_device}')
+                    builds.add(fname_device)
+
+                list_of_files.append([f, distro_train, fname_device, fname_githash, fname_uboot, dirpath, fname_timestamp, fname_size, file_subpath])
+            else:
+                if args.verbose:
+                    print(f'Ignored file: {f}')
+                continue
+
         # Sort file list by timestamp
         list_of_files.sort(key=lambda data: data[6])
 
-        # Sort list of release trains (8.0, 8.2, 9.0 etc.)
-        trains = []
+        # Group files by train and build so the per-train/build loops below can
+        # index a pair directly instead of rescanning every file for each pair.
+        # Each group maps filename -> row (in timestamp order, as dicts keep
+        # insertion order), so exact companion lookups are a single dict pop.
+        # Companion image/uboot/tarball files share the base filename, so they
+        # always live in the same group as the file they are matched against.
+        # worksets are keyed by (filename, subpath) so duplicate filenames in
+        # different subdirectories each keep their own row, as before
+        files_by_train_build = {}
+        for release_file in list_of_files:
+            files_by_train_build.setdefault((release_file[1], release_file[2]), {})[(release_file[0], release_file[8])] = release_file
 
-        for train in sorted(releases):
-            trains.append(train)
+        # Sort list of release trains (8.0, 8.2, 9.0 etc.)
+        trains = sorted(releases)
         if args.verbose:
             print(trains)
 
@@ -320,26 +432,60 @@ class ReleaseFile():
         if args.verbose:
             print(builds)
 
+        # Hash new files in parallel before the per-train/build loops below.
+        # SHA256 of a large image is CPU bound, so spreading the files across
+        # worker processes scales with core count and overlaps cold-cache reads.
+        to_hash = []
+        for release_file in list_of_files:
+            # old json digest is reused while size/timestamp still match
+            if self.oldhash_entry_current((release_file[1], release_file[2], release_file[0]), release_file[7], release_file[6]):
+                continue
+            # a renamed file's digest is found via its size/timestamp signature
+            if (release_file[7], release_file[6]) in self.oldhash_by_sig:
+                continue
+            fullpath = os.path.join(release_file[5], release_file[0])
+            # .sha256 file's checksum is used instead, see get_details
+            if f'{fullpath}.sha256' in self._sidecars:
+                continue
+            cache_key = (fullpath, release_file[7], release_file[6])
+            if cache_key in self.hashcache:
+                continue
+            to_hash.append((fullpath, cache_key))
+
+        if len(to_hash) > 1:
+            if args.verbose:
+                # hashlib dispatches to OpenSSL, which picks the SHA-NI
+                # accelerated sha256 on capable CPUs (OpenSSL 1.1.1+); log the
+                # version so operators can confirm the fast path is available
+                print(f'Hashing {len(to_hash)} files using {ssl.OPENSSL_VERSION}')
+            with ProcessPoolExecutor() as executor:
+                digests = list(executor.map(ChunkedHash.calculate_sha256, [fullpath for (fullpath, cache_key) in to_hash]))
+            self._digests = {fullpath: digest for ((fullpath, cache_key), digest) in zip(to_hash, digests)}
+            # persist the digests even for files that never reach get_details
+            # (eg. nightlies beyond the per-device limit), so the next run
+            # doesn't hash them again
+            self.hashcache.update((cache_key, digest) for ((fullpath, cache_key), digest) in zip(to_hash, digests))
+
         # make a dictionary where 'train;build' = [githashes of builds to add to json]
         nightly_githashes = {}
 
         for train in trains:     # ex: LibreELEC-10.0
             for build in builds: # ex: RPi2.arm
-                for release_file in list_of_files:
+                for release_file in files_by_train_build.get((train, build), {}).values():
                     # process one train and build at a time, and only nightlies
-                    if train in release_file and build in release_file and 'nightly' in release_file[0]:
+                    if 'nightly' in release_file[0]:
 
                         file_githash = release_file[3]
                         file_timestamp = release_file[6]
                         continue_loop = False
 
                         # add githash and timestamp to nightly_githashes if key doesn't exist
-                        if f'{train};{build}' not in nightly_githashes:
-                            nightly_githashes[f'{train};{build}'] = [f'{file_timestamp};{file_githash}']
+                        if (train, build) not in nightly_githashes:
+                            nightly_githashes[(train, build)] = [f'{file_timestamp};{file_githash}']
                             continue
 
                         # skip if githash already present
-                        for data in nightly_githashes[f'{train};{build}']:
+                        for data in nightly_githashes[(train, build)]:
                             if file_githash == data.split(';')[1]:
                                 continue_loop = True
                                 break
@@ -347,224 +493,222 @@ class ReleaseFile():
                             continue
 
                         # add if less than desired number of files per device
-                        if len(nightly_githashes[f'{train};{build}']) < BUILDS_PER_DEVICE:
-                            nightly_githashes[f'{train};{build}'].append(f'{file_timestamp};{file_githash}')
-                            nightly_githashes[f'{train};{build}'] = sorted(nightly_githashes[f'{train};{build}'])
+                        if len(nightly_githashes[(train, build)]) < BUILDS_PER_DEVICE:
+                            nightly_githashes[(train, build)].append(f'{file_timestamp};{file_githash}')
+                            nightly_githashes[(train, build)] = sorted(nightly_githashes[(train, build)])
                         # compare current githash to all those currently stored to see if current is newer
                         else:
-                            compared_timestamp = nightly_githashes[f'{train};{build}'][0].split(';')[0]
+                            compared_timestamp = nightly_githashes[(train, build)][0].split(';')[0]
 
                             if file_timestamp > compared_timestamp:
-                                del nightly_githashes[f'{train};{build}'][0]
-                                nightly_githashes[f'{train};{build}'].append(f'{file_timestamp};{file_githash}')
-                                nightly_githashes[f'{train};{build}'] = sorted(nightly_githashes[f'{train};{build}'])
+                                del nightly_githashes[(train, build)][0]
+                                nightly_githashes[(train, build)].append(f'{file_timestamp};{file_githash}')
+                                nightly_githashes[(train, build)] = sorted(nightly_githashes[(train, build)])
 
                 # strip timestamps from nightly_githashes for that device
                 try:
-                    for idx,data in enumerate(nightly_githashes[f'{train};{build}']):
-                        nightly_githashes[f'{train};{build}'][idx] = data.split(';')[1]
+                    for idx,data in enumerate(nightly_githashes[(train, build)]):
+                        nightly_githashes[(train, build)][idx] = data.split(';')[1]
                 except KeyError:
                     pass
 
         # Add train data to json
         for train in trains:
-            self.update_json[train] = {'canary': CANARY_PERIOD, 'url': url}
-            self.update_json[train]['prettyname_regex'] = self._prettyname
-            self.update_json[train]['project'] = {}
+            self.update_json[train] = {'canary': CANARY_PERIOD,
+                                       'prettyname_regex': self._prettyname,
+                                       'project': {},
+                                       'url': url}
 
         for train in trains:     # ex: LibreELEC-10.0
             for build in builds: # ex: RPi2.arm
-                entries = {}
+                entries = []
+
+                group_files = files_by_train_build.get((train, build), {})
 
-                for release_file in list(list_of_files): # copy so original may be modified
+                for release_file in list(group_files.values()): # copy so original may be modified
 
-                    # file may have been processed on a previous loop
-                    if release_file not in list_of_files:
+                    # file may have been consumed as a companion on a previous loop
+                    if (release_file[0], release_file[8]) not in group_files:
                         continue
 
                     # file is a nightly without a blessed githash
                     try:
-                        if 'nightly' in release_file[0] and release_file[3] not in nightly_githashes[f'{train};{build}']:
+                        if 'nightly' in release_file[0] and release_file[3] not in nightly_githashes[(train, build)]:
                             continue
                     except KeyError:
                         pass
 
                     entry = {}
-                    entry_position = len(entries)
-
-                    if train in release_file and build in release_file:
-
-                        base_filename = self.rchop(release_file[0], '.tar')
-                        base_filename = self.rchop(base_filename, '.img.gz')
-
-                        (file_digest, file_size) = self.get_details(release_file[5], train, build, release_file[0])
-                        # don't combine lchops; generates incorrect file_subpath for files not in subdir
-                        file_subpath = self.lchop(release_file[5], self._indir)
-                        file_subpath = self.lchop(file_subpath, '/')
-
-                        # *.tar
-                        if release_file[0].endswith('.tar'):
-                            uboot = []
-                            entry['file'] = {'name': release_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': release_file[6], 'subpath': file_subpath}
-                            list_of_files.remove(release_file)
-                            list_of_filenames.remove(release_file[0])
-                            # check for image files with same base name to add
-                            for image_file in list(list_of_files):
-                                # tar goes to a device using bare image files
-                                if f'{base_filename}.img.gz' == image_file[0]:
-                                    (file_digest, file_size) = self.get_details(image_file[5], train, build, image_file[0])
-                                    # don't combine lchops; generates incorrect file_subpath for files not in subdir
-                                    file_subpath = self.lchop(image_file[5], self._indir)
-                                    file_subpath = self.lchop(file_subpath, '/')
-                                    entry['image'] = {'name': image_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': image_file[6], 'subpath': file_subpath}
-                                    list_of_files.remove(image_file)
-                                    list_of_filenames.remove(image_file[0])
-                                # tar goes to a device using uboot image files
-                                # XXX: Quirk for LE 9.0: Skip uboot image inclusion as they weren't used in that release but generated images will be swept up in search.
-                                elif image_file[0].startswith(base_filename) and train != 'LibreELEC-9.0':
-                                    for uboot_file in list(list_of_files):
-                                        if uboot_file[0].startswith(base_filename) and not uboot_file[0].endswith('.tar'):
-                                            (file_digest, file_size) = self.get_details(uboot_file[5], train, build, uboot_file[0])
-                                            # don't combine lchops; generates incorrect file_subpath for files not in subdir
-                                            file_subpath = self.lchop(uboot_file[5], self._indir)
-                                            file_subpath = self.lchop(file_subpath, '/')
-                                            uboot.append({'name': uboot_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': uboot_file[6], 'subpath': file_subpath})
-                                            list_of_files.remove(uboot_file)
-                                            list_of_filenames.remove(uboot_file[0])
-                                    if uboot:
-                                        entry['uboot'] = uboot
-
-                        # *-{uboot}.img.gz
+
+                    base_filename = self.rchop(release_file[0], '.tar')
+                    base_filename = self.rchop(base_filename, '.img.gz')
+
+                    (file_digest, file_size) = self.get_details(release_file[5], train, build, release_file[0], release_file[7], release_file[6])
+                    file_subpath = release_file[8]
+
+                    # *.tar
+                    if release_file[0].endswith('.tar'):
+                        uboot = []
+                        entry['file'] = {'name': release_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': release_file[6]}
+                        del group_files[(release_file[0], release_file[8])]
+                        # tar goes to a device using bare image files
+                        image_file = self.pop_named(group_files, f'{base_filename}.img.gz')
+                        if image_file is not None:
+                            (file_digest, file_size) = self.get_details(image_file[5], train, build, image_file[0], image_file[7], image_file[6])
+                            file_subpath = image_file[8]
+                            entry['image'] = {'name': image_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': image_file[6]}
+                        # tar goes to a device using uboot image files
                         # XXX: Quirk for LE 9.0: Skip uboot image inclusion as they weren't used in that release but generated images will be swept up in search.
-                        elif release_file[4] and train != 'LibreELEC-9.0':
-                            uboot = []
-                            uboot.append({'name': release_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': release_file[6], 'subpath': file_subpath})
-                            list_of_files.remove(release_file)
-                            list_of_filenames.remove(release_file[0])
-                            # check for similar uboot releases
-                            for item in list(list_of_filenames):
-                                if item.startswith(self.rchop(base_filename, f'-{release_file[4]}')):
-                                    for image_file in list(list_of_files):
-                                        # base tarballs
-                                        if f'{self.rchop(base_filename, f"-{release_file[4]}")}.tar' == image_file[0]:
-                                            (file_digest, file_size) = self.get_details(image_file[5], train, build, image_file[0])
-                                            # don't combine lchops; generates incorrect file_subpath for files not in subdir
-                                            file_subpath = self.lchop(image_file[5], self._indir)
-                                            file_subpath = self.lchop(file_subpath, '/')
-                                            entry['file'] = {'name': image_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': image_file[6], 'subpath': file_subpath}
-                                            list_of_files.remove(image_file)
-                                            list_of_filenames.remove(image_file[0])
-                                        # other uboot images
-                                        elif image_file[0].startswith(self.rchop(base_filename, f'-{release_file[4]}')) and not image_file[0].endswith('.tar'):
-                                            (file_digest, file_size) = self.get_details(image_file[5], train, build, image_file[0])
-                                            # don't combine lchops; generates incorrect file_subpath for files not in subdir
-                                            file_subpath = self.lchop(image_file[5], self._indir)
-                                            file_subpath = self.lchop(file_subpath, '/')
-                                            uboot.append({'name': image_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': image_file[6], 'subpath': file_subpath})
-                                            list_of_files.remove(image_file)
-                                            list_of_filenames.remove(image_file[0])
-
-                            entry['uboot'] = uboot
-                        # *.img.gz
-                        elif release_file[0].endswith('.img.gz'):
-                            entry['image'] = {'name': release_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': release_file[6], 'subpath': file_subpath}
-                            list_of_files.remove(release_file)
-                            list_of_filenames.remove(release_file[0])
-                            # check for tarball files with same name so they may be added
-                            for tarball_file in list(list_of_files):
-                                if f'{base_filename}.tar' == tarball_file[0]:
-                                    (file_digest, file_size) = self.get_details(tarball_file[5], train, build, tarball_file[0])
-                                    # don't combine lchops; generates incorrect file_subpath if not in subdir
-                                    file_subpath = self.lchop(tarball_file[5], self._indir)
-                                    file_subpath = self.lchop(file_subpath, '/')
-                                    entry['file'] = {'name': tarball_file[0], 'sha256': file_digest, 'size': file_size, 'timestamp': tarball_file[6], 'subpath': file_subpath}
-                                    list_of_files.remove(tarball_file)
-                                    list_of_filenames.remove(tarball_file[0])
-
-                        entries[entry_position] = entry
-
-                # adds each file "grouping" as its own release
+                        if train != 'LibreELEC-9.0':
+                            for uboot_file in [data for data in group_files.values() if data[0].startswith(base_filename) and not data[0].endswith('.tar')]:
+                                (file_digest, file_size) = self.get_details(uboot_file[5], train, build, uboot_file[0], uboot_file[7], uboot_file[6])
+                                file_subpath = uboot_file[8]
+                                uboot.append({'name': uboot_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': uboot_file[6]})
+                                del group_files[(uboot_file[0], uboot_file[8])]
+                            if uboot:
+                                entry['uboot'] = uboot
+
+                    # *-{uboot}.img.gz
+                    # XXX: Quirk for LE 9.0: Skip uboot image inclusion as they weren't used in that release but generated images will be swept up in search.
+                    elif release_file[4] and train != 'LibreELEC-9.0':
+                        uboot = []
+                        uboot.append({'name': release_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': release_file[6]})
+                        del group_files[(release_file[0], release_file[8])]
+                        # base filename shared by all uboot variants of this release
+                        uboot_stem = self.rchop(base_filename, f'-{release_file[4]}')
+                        # base tarballs
+                        tarball_file = self.pop_named(group_files, f'{uboot_stem}.tar')
+                        if tarball_file is not None:
+                            (file_digest, file_size) = self.get_details(tarball_file[5], train, build, tarball_file[0], tarball_file[7], tarball_file[6])
+                            file_subpath = tarball_file[8]
+                            entry['file'] = {'name': tarball_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': tarball_file[6]}
+                        # other uboot images
+                        for image_file in [data for data in group_files.values() if data[0].startswith(uboot_stem) and not data[0].endswith('.tar')]:
+                            (file_digest, file_size) = self.get_details(image_file[5], train, build, image_file[0], image_file[7], image_file[6])
+                            file_subpath = image_file[8]
+                            uboot.append({'name': image_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': image_file[6]})
+                            del group_files[(image_file[0], image_file[8])]
+
+                        entry['uboot'] = uboot
+                    # *.img.gz
+                    elif release_file[0].endswith('.img.gz'):
+                        del group_files[(release_file[0], release_file[8])]
+                        # check for tarball files with same name so they may be
+                        # added; inserted ahead of the image to keep entry keys
+                        # in their serialized order
+                        tarball_file = self.pop_named(group_files, f'{base_filename}.tar')
+                        if tarball_file is not None:
+                            (tarball_digest, tarball_size) = self.get_details(tarball_file[5], train, build, tarball_file[0], tarball_file[7], tarball_file[6])
+                            entry['file'] = {'name': tarball_file[0], 'sha256': tarball_digest, 'size': tarball_size, 'subpath': tarball_file[8], 'timestamp': tarball_file[6]}
+                        entry['image'] = {'name': release_file[0], 'sha256': file_digest, 'size': file_size, 'subpath': file_subpath, 'timestamp': release_file[6]}
+
+                    entries.append(entry)
+
+                # adds each file "grouping" as its own release; the json
+                # schema keys releases by their index, so convert on emit
                 if len(entries) > 0:
-                    if build in self.display_name:
-                        self.update_json[train]['project'][build] = {'displayName': self.display_name[build], 'releases': entries}
-                    else:
-                        self.update_json[train]['project'][build] = {'displayName': build, 'releases': entries}
+                    self.update_json[train]['project'][build] = {'displayName': DISPLAY_NAME.get(build, build), 'releases': dict(enumerate(entries))}
 
     # Read old file if it exists, to avoid recalculating hashes when possible
     def ReadFile(self):
+        # sidecar digest cache keyed by (path, size, timestamp); lets runs
+        # against an unchanged archive skip hashing entirely
+        self.hashcache = {}
+        if os.path.exists(self._hashcache_file):
+            try:
+                with open(self._hashcache_file, 'rb') as f:
+                    self.hashcache = pickle.load(f)
+                if args.verbose:
+                    print(f'Read hash cache: {self._hashcache_file}')
+            except (OSError, EOFError, pickle.PickleError) as e:
+                print(f'WARNING: Failed to read hash cache: {self._hashcache_file}\n  {e}')
+                self.hashcache = {}
+
         self.oldhash = {}
+        # secondary index by content signature; lets renamed or re-trained
+        # files reuse their digest instead of being re-hashed
+        self.oldhash_by_sig = {}
         if os.path.exists(self._infile):
             try:
-                with open(self._infile, 'r') as f:
-                    oldjson = json.loads(f.read())
+                with open(self._infile, 'rb') as f:
+                    # orjson parses the document several times faster when present
+                    oldjson = orjson.loads(f.read()) if orjson else json.loads(f.read())
                     if args.verbose:
                         print(f'Read old json: {self._infile}')
-            except Exception as e:
+            except (OSError, ValueError) as e:
                 print(f'WARNING: Failed to read old json: {self._infile}\n  {e}')
                 self.oldhash = {}
             else:
-                for train in oldjson:
-                    for build in oldjson[train]['project']:
-                        for release in oldjson[train]['project'][build]['releases']:
-                            try:
-                                data = oldjson[train]['project'][build]['releases'][release]['file']
-                                if args.verbose:
-                                    print(f'Found old json entry for: {data["name"]}')
-                                self.oldhash[f'{train};{build};{data["name"]}'] = {'sha256': data['sha256'], 'size': data['size'], 'timestamp': data['timestamp']}
-                            except KeyError:
-                                pass
-                            try:
-                                data = oldjson[train]['project'][build]['releases'][release]['image']
+                # .get() chains instead of exception-as-control-flow: each
+                # release is walked once and missing sections skip cheaply
+                for (train, train_data) in oldjson.items():
+                    for (build, build_data) in train_data.get('project', {}).items():
+                        for release in build_data.get('releases', {}).values():
+                            for data in (release.get('file'), release.get('image'), *release.get('uboot', ())):
+                                if data is None:
+                                    continue
                                 if args.verbose:
                                     print(f'Found old json entry for: {data["name"]}')
-                                self.oldhash[f'{train};{build};{data["name"]}'] = {'sha256': data['sha256'], 'size': data['size'], 'timestamp': data['timestamp']}
-                            except KeyError:
-                                pass
-                            try:
-                                for data in oldjson[train]['project'][build]['releases'][release]['uboot']:
-                                    if args.verbose:
-                                        print(f'Found old json entry for: {data["name"]}')
-                                    self.oldhash[f'{train};{build};{data["name"]}'] = {'sha256': data['sha256'], 'size': data['size'], 'timestamp': data['timestamp']}
-                            except KeyError:
-                                pass
+                                self.oldhash[(train, build, data['name'])] = {'sha256': data['sha256'], 'size': data['size'], 'timestamp': data['timestamp']}
+                                self.oldhash_by_sig[(int(data['size']), data['timestamp'])] = data['sha256']
 
     # Write a new file
     def WriteFile(self):
-        with open(self._outfile, 'w') as f:
-            f.write(json.dumps(self.update_json, indent=2, sort_keys=True))
+        if orjson:
+            with open(self._outfile, 'wb') as f:
+                f.write(orjson.dumps(self.update_json,
+                                     option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            # json.dump streams into the file instead of building one big str
+            with open(self._outfile, 'w') as f:
+                json.dump(self.update_json, f, indent=2)
+
+        # persist the digest cache atomically (write tmp, then rename)
+        with open(f'{self._hashcache_file}.tmp', 'wb') as f:
+            pickle.dump(self.hashcache, f)
+        os.replace(f'{self._hashcache_file}.tmp', self._hashcache_file)
 
 #---------------------------------------------
 
-# Python3 will return map items in the same order they are added/created, but
-# Python2 will return the map in a random order, so convert the map to an OrderedDict()
-# to ensure the processing order of the map is consistently top to bottom.
-# Also pre-compile the regex as this is more efficient.
-_ = OrderedDict()
+# The per-label minor-version patterns are mutually exclusive, so fold them
+# into one compiled alternation (alternatives tried in VERSIONS order, top to
+# bottom) plus a dict mapping the matched minor to its (major, minor) bump.
+# One regex call and one dict lookup classify a train instead of up to six
+# searches, and integer bumps avoid float rounding in the train arithmetic:
+# the 80/90/95/97 pre-release minors roll over to the next major train, the
+# single-digit minors bump by adjust*10 (unstable +1, stable +0).
+VERSION_BUMP = {}
 for item in VERSIONS:
-    _[item[0]] = {'adjust': item[1],
-                  'minor': item[2],
-                  'regex': re.compile(fr'([0-9]+\.{item[2]})')}
-VERSIONS = _
+    if item[2].startswith('['):
+        # expand '[1,3,5,7]' style character classes to their digits
+        for minor in item[2][1:-1].split(','):
+            VERSION_BUMP[minor] = (0, round(item[1] * 10))
+    else:
+        VERSION_BUMP[item[2]] = (1, 0)
+VERSION_REGEX = re.compile(r'[0-9]+\.(' + '|'.join(item[2].replace(',', '') for item in VERSIONS) + r')')
 
 
-parser = argparse.ArgumentParser(description=f'Update {DISTRO_NAME} {JSON_FILE} with available tar/img.gz files.', \
-                                 formatter_class=lambda prog: argparse.HelpFormatter(prog,max_help_position=25,width=90))
+# Guarded so ProcessPoolExecutor workers can re-import this module without
+# re-running the script (required by the forkserver/spawn start methods)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=f'Update {DISTRO_NAME} {JSON_FILE} with available tar/img.gz files.', \
+                                     formatter_class=lambda prog: argparse.HelpFormatter(prog,max_help_position=25,width=90))
 
-parser.add_argument('-i', '--input', metavar='DIRECTORY', required=True, \
-                    help=f'Directory to parsed (release files, and any existing {JSON_FILE}). By default, {JSON_FILE} will be ' \
-                         'written into this directory. Required property.')
+    parser.add_argument('-i', '--input', metavar='DIRECTORY', required=True, \
+                        help=f'Directory to parsed (release files, and any existing {JSON_FILE}). By default, {JSON_FILE} will be ' \
+                             'written into this directory. Required property.')
 
-parser.add_argument('-u', '--url', metavar='URL', required=True, \
-                    help=f'Base URL for {JSON_FILE}. Required property.')
+    parser.add_argument('-u', '--url', metavar='URL', required=True, \
+                        help=f'Base URL for {JSON_FILE}. Required property.')
 
-parser.add_argument('-o', '--output', metavar='DIRECTORY', required=False, \
-                    help=f'Optional directory into which {JSON_FILE} will be written. Defaults to same directory as --input.')
+    parser.add_argument('-o', '--output', metavar='DIRECTORY', required=False, \
+                        help=f'Optional directory into which {JSON_FILE} will be written. Defaults to same directory as --input.')
 
-parser.add_argument('-p', '--prettyname', metavar='REGEX', required=False, \
-                    help=f'Optional prettyname regex, default is {PRETTYNAME}')
+    parser.add_argument('-p', '--prettyname', metavar='REGEX', required=False, \
+                        help=f'Optional prettyname regex, default is {PRETTYNAME}')
 
-parser.add_argument('-v', '--verbose', action="store_true", help='Enable verbose output (ignored files etc.)')
+    parser.add_argument('-v', '--verbose', action="store_true", help='Enable verbose output (ignored files etc.)')
 
-args = parser.parse_args()
+    args = parser.parse_args()
 
-ReleaseFile(args).UpdateAll()
+    ReleaseFile(args).UpdateAll()